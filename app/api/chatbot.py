@@ -1,14 +1,17 @@
-from typing import List
+import json
+from typing import List, Optional
 
-from fastapi import Depends, APIRouter
+from fastapi import Depends, APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from app.auth.dependencies import get_current_user, get_session_local
 from app.auth.schemas import User
 from sqlalchemy.orm import Session
 from app.chatbot.engine import get_similar_response
 from app.chatbot.schemas import ChatResponse, ChatRequest
-from app.db.models import Conversation
+from app.db.models import ArchiveMember, Conversation
 from app.chatbot.schemas import ChatConversation, ChatMessage
-from app.db.models import MessageHistory
+from app.db.connection import SessionLocal
+from app.db.archive import begin_snapshot, iter_hot_messages, iter_member, message_record, read_conversation
 
 router = APIRouter(
     prefix="/chatbot",
@@ -47,12 +50,13 @@ def chat_endpoint(request: ChatRequest,
 
 @router.get("/conversations", response_model=List[ChatConversation])
 def list_conversations(db: Session = Depends(get_session_local),current_user: User = Depends(get_current_user)):
-    """ Retrieve all chat conversations for the currently authenticated user,sorted from newest to oldest."""
+    """ Retrieve all chat conversations for the currently authenticated user, most recently active first.
+    Summary fields are read straight off the conversations table (ix_conversations_user_activity), no joins."""
 
     conversations = (
         db.query(Conversation)
         .filter(Conversation.user_id == current_user.id)
-        .order_by(Conversation.created_at.desc())
+        .order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
         .all()
     )
     return conversations
@@ -61,22 +65,66 @@ def list_conversations(db: Session = Depends(get_session_local),current_user: Us
 @router.get("/conversation/{conversation_id}", response_model=List[ChatMessage])
 def get_conversation(conversation_id: int, db: Session = Depends(get_session_local),
                      current_user: User = Depends(get_current_user)):
-    """ Retrieve messages for a conversation, ordered by timestamp, and format them as ChatMessage objects."""
+    """ Retrieve messages for a conversation, in the order they were sent, and format them as ChatMessage objects.
+    Archived messages (cold storage) come first, followed by whatever is still in the hot table."""
 
-    messages = (
-        db.query(MessageHistory)
-        .filter(MessageHistory.conversation_id == conversation_id)
-        .order_by(MessageHistory.timestamp.asc())
-        .all()
+    conversation = (
+        db.query(Conversation)
+        .filter(Conversation.id == conversation_id, Conversation.user_id == current_user.id)
+        .first()
     )
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
 
-    result = [
-        ChatMessage(
-            sender="bot" if msg.is_bot else "user",
-            text=msg.message,
-            timestamp=msg.timestamp
-        )
-        for msg in messages
+    return [
+        ChatMessage(sender=record["sender"], text=record["text"], timestamp=record["timestamp"])
+        for record in read_conversation(db, conversation)
     ]
 
-    return result
+
+def _export_lines(user_id: int, conversation_id: Optional[int]):
+    """ NDJSON lines: archived records conversation by conversation, then hot rows via a server side cursor.
+    Uses its own session, the request scoped one is closed before a streamed body is sent. Archive pointers and
+    hot rows are read in one snapshot, so rows the archive job moves meanwhile are in exactly one of the two."""
+
+    db = SessionLocal()
+    try:
+        begin_snapshot(db)
+        query = (
+            db.query(ArchiveMember)
+            .join(Conversation, ArchiveMember.conversation_id == Conversation.id)
+            .filter(Conversation.user_id == user_id)
+        )
+        if conversation_id:
+            query = query.filter(ArchiveMember.conversation_id == conversation_id)
+
+        for member in query.order_by(ArchiveMember.conversation_id.asc(), ArchiveMember.id.asc()).all():
+            for record in iter_member(member):
+                yield json.dumps(record) + "\n"
+
+        filters = {"conversation_id": conversation_id} if conversation_id else {"user_id": user_id}
+        for msg in iter_hot_messages(db, **filters):
+            yield json.dumps(message_record(msg)) + "\n"
+    finally:
+        db.close()
+
+
+@router.get("/export")
+def export_messages(conversation_id: Optional[int] = None, db: Session = Depends(get_session_local),
+                    current_user: User = Depends(get_current_user)):
+    """ Stream the current user's message history (or a single conversation of theirs) as NDJSON,
+    including archived messages, without loading it into memory."""
+
+    if conversation_id:
+        owned = (
+            db.query(Conversation.id)
+            .filter(Conversation.id == conversation_id, Conversation.user_id == current_user.id)
+            .first()
+        )
+        if not owned:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+    return StreamingResponse(
+        _export_lines(current_user.id, conversation_id),
+        media_type="application/x-ndjson"
+    )
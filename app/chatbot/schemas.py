@@ -22,6 +22,9 @@ class ChatResponse(BaseModel):
 class ChatConversation(BaseModel):
     id: int
     title: str
+    last_message_at: Optional[datetime] = None
+    message_count: int = 0
+    last_preview: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -0,0 +1,210 @@
+"""archive.py : cold storage for message_history. Idle conversations are moved out of the hot table into
+gzip'd NDJSON segment files. Segments are write-once: a run writes a new segment and never touches old ones.
+Each run adds one gzip member per conversation holding only the rows it took from the hot table, recorded in
+archive_members; a conversation's archive is its members in order, so re-archiving never copies old data."""
+
+import gzip
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.db.models import ArchiveMember, Conversation, MessageHistory
+
+load_dotenv()
+
+# resolved up front, the chatbot engine changes the working dir on import
+ARCHIVE_DIR = Path(os.getenv("MESSAGE_ARCHIVE_DIR") or Path(__file__).resolve().parents[2] / "archive").resolve()
+
+STREAM_BATCH = 1000  # rows per server side cursor fetch
+READ_CHUNK = 64 * 1024  # compressed bytes read at a time from a segment
+SEGMENT_GLOB = "segment-*.ndjson.gz*"  # published segments and leftover .tmp files
+
+
+def message_record(msg: MessageHistory):
+    """one archived / exported message as a json-able dict"""
+    return {
+        "id": msg.id,
+        "conversation_id": msg.conversation_id,
+        "user_id": msg.user_id,
+        "sender": "bot" if msg.is_bot else "user",
+        "text": msg.message,
+        "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
+    }
+
+
+def _iter_member(segment: str, offset: int, length: int):
+    """stream the records of one gzip member, i.e. one conversation, without touching the rest of the segment"""
+    decompressor = zlib.decompressobj(wbits=31)  # 31: expect a gzip header
+    pending = b""
+    with open(ARCHIVE_DIR / segment, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            chunk = f.read(min(READ_CHUNK, remaining))
+            if not chunk:
+                raise EOFError(f"archive segment {segment} is truncated")
+            remaining -= len(chunk)
+            pending += decompressor.decompress(chunk)
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+    pending += decompressor.flush()
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def iter_member(member: ArchiveMember):
+    """records of one archive member, oldest first"""
+    return _iter_member(member.segment, member.byte_offset, member.byte_length)
+
+
+def iter_archived_messages(db: Session, conversation_id: int):
+    """archived records of a single conversation, oldest first (empty if it was never archived)"""
+    members = (
+        db.query(ArchiveMember)
+        .filter(ArchiveMember.conversation_id == conversation_id)
+        .order_by(ArchiveMember.id.asc())
+        .all()
+    )
+    for member in members:
+        yield from iter_member(member)
+
+
+def iter_hot_messages(db: Session, **filters):
+    """stream message_history rows with a server side cursor so memory stays flat on large histories"""
+    query = db.query(MessageHistory)
+    if "conversation_id" in filters:
+        query = query.filter(MessageHistory.conversation_id == filters["conversation_id"])
+    if "user_id" in filters:
+        query = query.filter(MessageHistory.user_id == filters["user_id"])
+    return (
+        query.order_by(MessageHistory.conversation_id.asc(), MessageHistory.id.asc())
+        .execution_options(stream_results=True)
+        .yield_per(STREAM_BATCH)
+    )
+
+
+def begin_snapshot(db: Session):
+    """pin a fresh session's transaction to REPEATABLE READ, so an archive pointer and the hot rows read after it
+    come from one snapshot even if the archive job commits in between. call before the session's first query"""
+    if db.get_bind().dialect.name != "sqlite":  # sqlite transactions are serializable already
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+
+def read_conversation(db: Session, conversation: Conversation, attempts: int = 3):
+    """all records of one conversation, archived first then hot. if the archive job moved it while we were reading
+    (archived_at changed, possible under READ COMMITTED) the two halves may not line up, so read it again"""
+    for _ in range(attempts):
+        archived_at = conversation.archived_at
+        records = list(iter_archived_messages(db, conversation.id))
+        records += [
+            message_record(msg)
+            for msg in db.query(MessageHistory)
+            .filter(MessageHistory.conversation_id == conversation.id)
+            .order_by(MessageHistory.id.asc())
+            .all()
+        ]
+        db.refresh(conversation)
+        if conversation.archived_at == archived_at:
+            return records
+    raise RuntimeError(f"conversation {conversation.id} kept being archived while it was read")
+
+
+def _write_segment(db: Session, conversations, segment: str):
+    """write the hot rows of `conversations` into a new segment, one gzip member per conversation that has any.
+    returns {conversation_id: highest hot message id written} and
+    {conversation_id: (offset, length, message count)} of each member"""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = ARCHIVE_DIR / segment
+    tmp_path = path.with_name(path.name + ".tmp")
+    archived_up_to = {}
+    members = {}
+
+    with open(tmp_path, "wb") as f:
+        for convo in conversations:
+            offset = f.tell()
+            count = 0
+            with gzip.GzipFile(filename="", mode="wb", fileobj=f) as member:
+                for msg in iter_hot_messages(db, conversation_id=convo.id):
+                    member.write((json.dumps(message_record(msg)) + "\n").encode("utf-8"))
+                    archived_up_to[convo.id] = msg.id
+                    count += 1
+            if count:
+                members[convo.id] = (offset, f.tell() - offset, count)
+            else:
+                # nothing hot to move, drop the empty member again
+                f.seek(offset)
+                f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+    # only publish complete segments, a crash before this leaves the hot rows untouched
+    os.replace(tmp_path, path)
+    return archived_up_to, members
+
+
+def archive_idle_conversations(db: Session, idle_days: int, batch_size: int = 200):
+    """move conversations with no activity for `idle_days` into cold storage, one segment per batch.
+    returns the number of conversations archived"""
+    cutoff = datetime.now() - timedelta(days=idle_days)
+    archived = 0
+
+    while True:
+        conversations = (
+            db.query(Conversation)
+            .filter(
+                Conversation.last_message_at < cutoff,
+                Conversation.message_count > 0,
+                (Conversation.archived_at.is_(None)) | (Conversation.last_message_at > Conversation.archived_at),
+            )
+            .order_by(Conversation.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not conversations:
+            break
+
+        now = datetime.now()
+        segment = f"segment-{now:%Y%m%d%H%M%S%f}.ndjson.gz"
+        archived_up_to, members = _write_segment(db, conversations, segment)
+
+        for convo in conversations:
+            if convo.id in members:
+                offset, length, count = members[convo.id]
+                db.add(ArchiveMember(
+                    conversation_id=convo.id,
+                    segment=segment,
+                    byte_offset=offset,
+                    byte_length=length,
+                    message_count=count,
+                    created_at=now
+                ))
+                # bounded by id so a message saved while the segment was written stays in the hot table
+                db.query(MessageHistory).filter(
+                    MessageHistory.conversation_id == convo.id,
+                    MessageHistory.id <= archived_up_to[convo.id],
+                ).delete(synchronize_session=False)
+            convo.archived_at = now
+        db.commit()
+        archived += len(conversations)
+
+    return archived
+
+
+def prune_segments(db: Session, grace_hours: float = 24):
+    """delete segment files no archive member points at, i.e. leftovers of a run that failed before its commit
+    (or an empty batch). a file is only removed once it is `grace_hours` old, so a segment published just before
+    its batch commits is never taken. returns the number of files removed"""
+    referenced = {segment for (segment,) in db.query(ArchiveMember.segment).distinct()}
+    cutoff = time.time() - grace_hours * 3600
+    removed = 0
+    for path in ARCHIVE_DIR.glob(SEGMENT_GLOB):
+        if path.name not in referenced and path.stat().st_mtime < cutoff:
+            path.unlink()
+            removed += 1
+    return removed
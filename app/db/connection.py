@@ -8,7 +8,9 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, connect_args={"charset": "utf8mb4"})
+# charset is a MySQL driver arg, other backends (e.g. sqlite in tests) don't accept it
+connect_args = {"charset": "utf8mb4"} if DATABASE_URL.startswith("mysql") else {}
+engine = create_engine(DATABASE_URL, connect_args=connect_args)
 
 """session maker func(custom session) returns a class, we save it in the variable sessionLocal. to talk 
 to the db we need to create objects from this (auth.dependencies = db)."""
@@ -1,20 +1,129 @@
 """crud.py : crud operations relating to  db"""
 
+from datetime import datetime, timezone
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from app.db.models import MessageHistory
+from app.db.models import MessageHistory, Conversation, ArchiveMember
+from app.db.archive import iter_member
 
 
+PREVIEW_LENGTH = 100  # chars of the latest message kept on conversations.last_preview
+
+
+def _preview(message: str):
+    return message[:PREVIEW_LENGTH] if message else None
+
+
+def _created_local(convo: Conversation):
+    """created_at is stored in utc, message timestamps / last_message_at in local time"""
+    if convo.created_at is None:
+        return None
+    return convo.created_at.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
 
 
 """create msg in db"""
 def save_message(user_id: int, conversation_id: int, message: str, is_bot: bool, db: Session):
+    now = datetime.now()
     new_message = MessageHistory(
         conversation_id=conversation_id,
         user_id=user_id,
         message=message,
-        is_bot=is_bot
+        is_bot=is_bot,
+        timestamp=now
+    )
+
+    # keep the conversation summary in step, same transaction as the insert. the UPDATE goes first so it takes
+    # the row lock before the message is visible (see rebuild_conversation_summaries)
+    db.query(Conversation).filter(Conversation.id == conversation_id).update(
+        {
+            Conversation.message_count: Conversation.message_count + 1,
+            Conversation.last_message_at: now,
+            Conversation.last_preview: _preview(message),
+        },
+        synchronize_session=False
     )
     db.add(new_message)
     db.commit()
     db.refresh(new_message)
-    return new_message
\ No newline at end of file
+    return new_message
+
+
+"""recompute conversation summaries from message_history (backfill / repair)"""
+def rebuild_conversation_summaries(db: Session, batch_size: int = 500):
+    updated = 0
+    last_id = 0
+    while True:
+        # row locks until the batch commits: a concurrent save_message blocks on its summary UPDATE instead of
+        # having its increment overwritten by the absolute values written below
+        conversations = (
+            db.query(Conversation)
+            .filter(Conversation.id > last_id)
+            .order_by(Conversation.id.asc())
+            .limit(batch_size)
+            .with_for_update()
+            .all()
+        )
+        if not conversations:
+            break
+        ids = [c.id for c in conversations]
+        last_id = ids[-1]
+
+        stats = {
+            row.conversation_id: row
+            for row in (
+                db.query(
+                    MessageHistory.conversation_id,
+                    func.count(MessageHistory.id).label("message_count"),
+                    func.max(MessageHistory.id).label("last_id"),
+                )
+                .filter(MessageHistory.conversation_id.in_(ids))
+                .group_by(MessageHistory.conversation_id)
+                .all()
+            )
+        }
+        latest = {
+            msg.conversation_id: msg
+            for msg in db.query(MessageHistory)
+            .filter(MessageHistory.id.in_([row.last_id for row in stats.values()]))
+            .all()
+        } if stats else {}
+
+        # archived messages count too. counts come from archive_members, and only conversations with nothing hot
+        # left need their newest member decompressed for the preview
+        archived_count, newest_member = {}, {}
+        for member in (
+            db.query(ArchiveMember)
+            .filter(ArchiveMember.conversation_id.in_(ids))
+            .order_by(ArchiveMember.id.asc())
+            .all()
+        ):
+            cid = member.conversation_id
+            archived_count[cid] = archived_count.get(cid, 0) + member.message_count
+            newest_member[cid] = member
+        archived_last = {}
+        for convo_id, member in newest_member.items():
+            if convo_id not in latest:
+                for record in iter_member(member):
+                    archived_last[convo_id] = record
+
+        for convo in conversations:
+            row = stats.get(convo.id)
+            last_msg = latest.get(convo.id)
+            last_archived = archived_last.get(convo.id)
+            convo.message_count = (row.message_count if row else 0) + archived_count.get(convo.id, 0)
+            if last_msg:
+                convo.last_message_at = last_msg.timestamp
+                convo.last_preview = _preview(last_msg.message)
+            elif last_archived:
+                if last_archived["timestamp"]:
+                    convo.last_message_at = datetime.fromisoformat(last_archived["timestamp"])
+                else:
+                    convo.last_message_at = _created_local(convo)
+                convo.last_preview = _preview(last_archived["text"])
+            else:
+                convo.last_message_at = _created_local(convo)
+                convo.last_preview = None
+
+        db.commit()
+        updated += len(conversations)
+    return updated
@@ -0,0 +1,62 @@
+"""manage.py : maintenance commands for the db, run with `python -m app.db.manage <command>`"""
+
+import argparse
+from app.db.connection import SessionLocal, engine
+from app.db.schema import upgrade_schema
+from app.db.crud import rebuild_conversation_summaries
+from app.db.archive import archive_idle_conversations, prune_segments
+
+
+def migrate(args):
+    """add columns/indexes the models define but the existing tables lack"""
+    statements = upgrade_schema(engine)
+    for statement in statements:
+        print(statement)
+    print(f"Schema up to date ({len(statements)} changes)")
+
+
+def rebuild_summaries(args):
+    """backfill/repair conversations.message_count, last_message_at and last_preview"""
+    db = SessionLocal()
+    try:
+        updated = rebuild_conversation_summaries(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Rebuilt summaries for {updated} conversations")
+
+
+def archive(args):
+    """move conversations idle for --idle-days into compressed cold storage segments"""
+    db = SessionLocal()
+    try:
+        archived = archive_idle_conversations(db, idle_days=args.idle_days, batch_size=args.batch_size)
+        pruned = prune_segments(db, grace_hours=args.grace_hours)
+    finally:
+        db.close()
+    print(f"Archived {archived} conversations, removed {pruned} unreferenced segments")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.db.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_cmd = commands.add_parser("migrate", help="add missing columns and indexes to existing tables")
+    migrate_cmd.set_defaults(func=migrate)
+
+    rebuild = commands.add_parser("rebuild-summaries", help="recompute conversation summaries from message_history")
+    rebuild.add_argument("--batch-size", type=int, default=500)
+    rebuild.set_defaults(func=rebuild_summaries)
+
+    archive_cmd = commands.add_parser("archive", help="move idle conversations out of message_history")
+    archive_cmd.add_argument("--idle-days", type=int, default=90)
+    archive_cmd.add_argument("--batch-size", type=int, default=200)
+    archive_cmd.add_argument("--grace-hours", type=float, default=24,
+                             help="keep unreferenced segments this long before deleting them")
+    archive_cmd.set_defaults(func=archive)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
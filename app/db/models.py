@@ -1,7 +1,7 @@
 """models.py : contains all the models/classes mapped to the db tables"""
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.connection import Base
 
@@ -23,7 +23,7 @@ class MessageHistory(Base):
     conversation_id = Column(Integer, ForeignKey("conversations.id"))
     message = Column(Text, nullable=False)
     is_bot = Column(Boolean, default=False)
-    timestamp = Column(DateTime, default=datetime.now())
+    timestamp = Column(DateTime, default=datetime.now)
 
    # user = relationship("User", back_populates="messages")
     conversation = relationship("Conversation", back_populates="messages")
@@ -36,4 +36,31 @@ class Conversation(Base):
     title = Column(String(255), default="New Conversation")
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    messages = relationship("MessageHistory", back_populates="conversation")
\ No newline at end of file
+    # denormalized summary, kept up to date by crud.save_message (repair with `python -m app.db.manage rebuild-summaries`)
+    last_message_at = Column(DateTime, default=datetime.now)
+    message_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_preview = Column(String(255), nullable=True)
+
+    # cold storage (see app/db/archive.py): when the last archive run took this conversation's hot rows
+    archived_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_conversations_user_activity", "user_id", "last_message_at"),
+    )
+
+    messages = relationship("MessageHistory", back_populates="conversation")
+    archive_members = relationship("ArchiveMember", back_populates="conversation", order_by="ArchiveMember.id")
+
+# one archive run's messages for one conversation: a gzip member at a byte range of a segment file
+class ArchiveMember(Base):
+    __tablename__ = "archive_members"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), index=True)
+    segment = Column(String(255), nullable=False, index=True)
+    byte_offset = Column(BigInteger, nullable=False)
+    byte_length = Column(BigInteger, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+    conversation = relationship("Conversation", back_populates="archive_members")
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""schema.py : brings an existing db up to date with the models. create_all only creates missing tables,
+so columns and indexes added to a model later are added here. idempotent, safe to run on every start"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from app.db.connection import Base
+
+
+def upgrade_schema(bind):
+    """create missing tables, then add any model column or index an existing table lacks.
+    returns the DDL statements that were run"""
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    statements = []
+
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    statements.append(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                    conn.execute(text(statements[-1]))
+
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    statements.append(str(CreateIndex(index).compile(dialect=bind.dialect)))
+                    conn.execute(CreateIndex(index))
+
+    return statements
@@ -4,12 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.db import Base, engine
 from app.db import models
+from app.db.schema import upgrade_schema
 
 app = FastAPI()
 @app.on_event("startup")
 def on_startup():
     print("Creating tables...")
-    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
 
 # origins = [
 #     "http://localhost:5173"
@@ -0,0 +1,45 @@
+"""shared fixtures: the tests run against a throwaway sqlite db and archive dir"""
+
+import os
+import tempfile
+
+# must be set before app.db is imported, connection.py reads it at import time
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["MESSAGE_ARCHIVE_DIR"] = tempfile.mkdtemp()
+# app.auth.utils needs these at import time (pulled in by the routers)
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("REFRESH_TOKEN_SECRET_KEY", "test")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_MINUTES", "10080")
+
+import pytest
+from app.db import archive
+from app.db.connection import Base, SessionLocal, engine
+from app.db.schema import upgrade_schema
+from app.db.models import User
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    upgrade_schema(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(username="tester", email="tester@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from app.db import archive
+from app.db.archive import archive_idle_conversations, prune_segments, read_conversation
+from app.db.crud import save_message, rebuild_conversation_summaries
+from app.db.models import ArchiveMember, Conversation, MessageHistory
+
+
+def _conversation(db, user, texts):
+    convo = Conversation(user_id=user.id, title="t")
+    db.add(convo)
+    db.commit()
+    for i, text in enumerate(texts):
+        save_message(user.id, convo.id, text, is_bot=i % 2 == 1, db=db)
+    db.refresh(convo)
+    return convo
+
+
+def _age(db, convo, days):
+    """pretend `days` went by since the conversation's last activity (and its last archive run)"""
+    db.refresh(convo)
+    convo.last_message_at -= timedelta(days=days)
+    if convo.archived_at:
+        convo.archived_at -= timedelta(days=days)
+    db.commit()
+
+
+def _texts(db, convo):
+    return [record["text"] for record in read_conversation(db, convo)]
+
+
+def _members(db, convo):
+    return db.query(ArchiveMember).filter(ArchiveMember.conversation_id == convo.id).order_by(ArchiveMember.id).all()
+
+
+def test_archive_new_message_and_rearchive_keep_order_and_counts(db, user, archive_dir):
+    texts = [f"m{i}" for i in range(6)]
+    convo = _conversation(db, user, texts)
+    _age(db, convo, 100)
+
+    assert archive_idle_conversations(db, idle_days=90) == 1
+    db.refresh(convo)
+    [first] = _members(db, convo)
+    first_bytes = (archive_dir / first.segment).read_bytes()
+    assert first.message_count == 6
+    assert db.query(MessageHistory).count() == 0
+    assert _texts(db, convo) == texts
+    assert convo.message_count == 6
+
+    # new activity lands in the hot table, reads merge archive + hot
+    save_message(user.id, convo.id, "after", is_bot=False, db=db)
+    db.refresh(convo)
+    assert _texts(db, convo) == texts + ["after"]
+    assert convo.message_count == 7
+
+    # not idle yet, nothing to do
+    assert archive_idle_conversations(db, idle_days=90) == 0
+
+    # re-archiving appends a member with just the new row, the first one is left as it was
+    _age(db, convo, 100)
+    assert archive_idle_conversations(db, idle_days=90) == 1
+    db.refresh(convo)
+    old, new = _members(db, convo)
+    assert (old.segment, old.byte_offset, old.byte_length) == (first.segment, first.byte_offset, first.byte_length)
+    assert (archive_dir / first.segment).read_bytes() == first_bytes
+    assert new.segment != first.segment
+    assert new.message_count == 1
+    assert db.query(MessageHistory).count() == 0
+    assert _texts(db, convo) == texts + ["after"]
+
+    # rebuild sees archived messages too
+    convo.message_count = 0
+    convo.last_preview = None
+    db.commit()
+    rebuild_conversation_summaries(db)
+    db.refresh(convo)
+    assert convo.message_count == 7
+    assert convo.last_preview == "after"
+
+
+def test_each_conversation_reads_only_its_own_member(db, user, monkeypatch):
+    monkeypatch.setattr(archive, "READ_CHUNK", 16)  # force members across many chunks
+    first = _conversation(db, user, [f"a{i} " + "x" * 40 for i in range(50)])
+    second = _conversation(db, user, [f"b{i}" for i in range(3)])
+    _age(db, first, 100)
+    _age(db, second, 100)
+
+    assert archive_idle_conversations(db, idle_days=90) == 2
+    [first_member] = _members(db, first)
+    [second_member] = _members(db, second)
+    assert first_member.segment == second_member.segment
+    assert second_member.byte_offset == first_member.byte_offset + first_member.byte_length
+    assert _texts(db, first) == [f"a{i} " + "x" * 40 for i in range(50)]
+    assert _texts(db, second) == ["b0", "b1", "b2"]
+
+
+def test_message_saved_while_writing_segment_stays_hot(db, user, monkeypatch):
+    convo = _conversation(db, user, ["old"])
+    _age(db, convo, 100)
+    write_segment = archive._write_segment
+
+    def write_then_chat(*args):
+        result = write_segment(*args)
+        save_message(user.id, convo.id, "racing", is_bot=False, db=db)
+        return result
+
+    monkeypatch.setattr(archive, "_write_segment", write_then_chat)
+    archive_idle_conversations(db, idle_days=90)
+
+    assert [msg.message for msg in db.query(MessageHistory).all()] == ["racing"]
+    db.refresh(convo)
+    assert _texts(db, convo) == ["old", "racing"]
+
+
+def test_prune_removes_only_unreferenced_segments(db, user, archive_dir):
+    first = _conversation(db, user, ["a"])
+    _age(db, first, 100)
+    archive_idle_conversations(db, idle_days=90)
+    save_message(user.id, first.id, "a2", is_bot=False, db=db)
+    _age(db, first, 100)
+    archive_idle_conversations(db, idle_days=90)
+    referenced = {member.segment for member in _members(db, first)}
+    assert len(referenced) == 2
+
+    # leftovers of runs that died before their commit
+    (archive_dir / "segment-crashed.ndjson.gz.tmp").write_bytes(b"")
+    (archive_dir / "segment-uncommitted.ndjson.gz").write_bytes(b"")
+
+    assert prune_segments(db, grace_hours=1) == 0  # everything is within the grace period
+    assert prune_segments(db, grace_hours=0) == 2
+    assert {path.name for path in archive_dir.iterdir()} == referenced
+    db.refresh(first)
+    assert _texts(db, first) == ["a", "a2"]
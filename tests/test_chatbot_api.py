@@ -0,0 +1,90 @@
+"""chatbot router: archive-backed reads and the NDJSON export. the real engine loads the SBERT model (and changes
+the working dir) on import, so a stand-in is registered before the router is imported"""
+
+import json
+import sys
+import types
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from app.db.archive import archive_idle_conversations
+from app.db.crud import save_message
+from app.db.models import Conversation, User
+
+
+@pytest.fixture
+def chatbot(monkeypatch):
+    engine = types.ModuleType("app.chatbot.engine")
+    engine.get_similar_response = lambda *args: "ok"
+    monkeypatch.setitem(sys.modules, "app.chatbot.engine", engine)
+    monkeypatch.delitem(sys.modules, "app.api.chatbot", raising=False)
+    from app.api import chatbot
+    return chatbot
+
+
+@pytest.fixture
+def history(db, user):
+    """user: `archived` (3 archived messages + 1 hot) and `hot` (2 hot); someone else: `foreign`"""
+    other = User(username="other", email="other@example.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+
+    def conversation(owner, texts):
+        convo = Conversation(user_id=owner.id, title=texts[0])
+        db.add(convo)
+        db.commit()
+        for text in texts:
+            save_message(owner.id, convo.id, text, is_bot=False, db=db)
+        return convo
+
+    archived = conversation(user, ["a0", "a1", "a2"])
+    db.refresh(archived)
+    archived.last_message_at -= timedelta(days=100)
+    db.commit()
+    assert archive_idle_conversations(db, idle_days=90) == 1
+    save_message(user.id, archived.id, "a3", is_bot=False, db=db)
+
+    hot = conversation(user, ["h0", "h1"])
+    foreign = conversation(other, ["f0"])
+    return {"archived": archived.id, "hot": hot.id, "foreign": foreign.id, "other": other}
+
+
+def _export(chatbot, user_id, conversation_id=None):
+    lines = list(chatbot._export_lines(user_id, conversation_id))
+    assert all(line.endswith("\n") for line in lines)
+    return [json.loads(line) for line in lines]
+
+
+def test_export_user_streams_archived_then_hot(chatbot, user, history):
+    records = _export(chatbot, user.id)
+
+    assert [record["text"] for record in records] == ["a0", "a1", "a2", "a3", "h0", "h1"]
+    assert {record["conversation_id"] for record in records} == {history["archived"], history["hot"]}
+    assert {record["sender"] for record in records} == {"user"}
+
+
+def test_export_single_conversation(chatbot, user, history):
+    assert [record["text"] for record in _export(chatbot, user.id, history["archived"])] == ["a0", "a1", "a2", "a3"]
+    assert [record["text"] for record in _export(chatbot, user.id, history["hot"])] == ["h0", "h1"]
+
+
+def test_export_of_someone_elses_conversation_is_404(chatbot, db, user, history):
+    with pytest.raises(HTTPException) as error:
+        chatbot.export_messages(conversation_id=history["foreign"], db=db, current_user=user)
+    assert error.value.status_code == 404
+
+    response = chatbot.export_messages(conversation_id=history["archived"], db=db, current_user=user)
+    assert response.media_type == "application/x-ndjson"
+
+
+def test_get_conversation_merges_archive_and_checks_owner(chatbot, db, user, history):
+    messages = chatbot.get_conversation(history["archived"], db=db, current_user=user)
+    assert [message.text for message in messages] == ["a0", "a1", "a2", "a3"]
+
+    with pytest.raises(HTTPException) as error:
+        chatbot.get_conversation(history["foreign"], db=db, current_user=user)
+    assert error.value.status_code == 404
+
+    # the owner can still read it
+    messages = chatbot.get_conversation(history["foreign"], db=db, current_user=history["other"])
+    assert [message.text for message in messages] == ["f0"]
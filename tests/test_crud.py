@@ -0,0 +1,43 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from app.db.crud import save_message, rebuild_conversation_summaries, PREVIEW_LENGTH
+from app.db.models import Conversation
+
+
+def test_save_message_updates_summary(db, user):
+    convo = Conversation(user_id=user.id, title="t")
+    db.add(convo)
+    db.commit()
+
+    save_message(user.id, convo.id, "hello", is_bot=False, db=db)
+    save_message(user.id, convo.id, "x" * 500, is_bot=True, db=db)
+
+    db.refresh(convo)
+    assert convo.message_count == 2
+    assert convo.last_preview == "x" * PREVIEW_LENGTH
+    assert abs(convo.last_message_at - datetime.now()) < timedelta(minutes=1)
+
+
+@pytest.fixture
+def local_tz(monkeypatch):
+    """a non-utc local zone (no DST), so utc and local time actually differ"""
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    yield timedelta(hours=5, minutes=30)
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_rebuild_uses_local_clock_for_empty_conversations(db, user, local_tz):
+    created_utc = datetime(2024, 1, 15, 12, 0)
+    convo = Conversation(user_id=user.id, title="empty", created_at=created_utc)
+    db.add(convo)
+    db.commit()
+
+    assert rebuild_conversation_summaries(db) == 1
+
+    db.refresh(convo)
+    assert convo.message_count == 0
+    assert convo.last_preview is None
+    assert convo.last_message_at == created_utc + local_tz
@@ -0,0 +1,30 @@
+from sqlalchemy import create_engine, inspect, text
+from app.db.schema import upgrade_schema
+
+
+def test_upgrade_schema_adds_missing_columns_and_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        # conversations as it was before the summary columns
+        conn.execute(text(
+            "CREATE TABLE conversations (id INTEGER PRIMARY KEY, user_id INTEGER, "
+            "title VARCHAR(255), created_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO conversations (id, user_id, title) VALUES (1, 1, 'old')"))
+
+    statements = upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("conversations")}
+    assert {"last_message_at", "message_count", "last_preview"} <= columns
+    assert "archived_at" in columns
+    assert "archive_members" in inspector.get_table_names()
+    assert "ix_conversations_user_activity" in {index["name"] for index in inspector.get_indexes("conversations")}
+    assert any("message_count" in statement for statement in statements)
+
+    with engine.connect() as conn:
+        # existing rows get the server default
+        assert conn.execute(text("SELECT message_count FROM conversations WHERE id = 1")).scalar() == 0
+
+    # second run is a no-op
+    assert upgrade_schema(engine) == []